@@ -1,6 +1,7 @@
 import fs from "fs/promises";
 import path from "path";
 import { appendChunks } from "../retrieval/store";
+import { EmbeddingPrecision } from "../retrieval/quantize";
 
 export interface IndexDocumentsOptions {
     sourceDir: string;
@@ -9,6 +10,7 @@ export interface IndexDocumentsOptions {
     overlap?: number;
     allowedExtensions?: string[];
     embeddingModel?: string;
+    embeddingPrecision?: EmbeddingPrecision;
 }
 
 export interface FileRecord {
@@ -21,6 +23,7 @@ export interface ChunkRecord {
     filePath: string;
     content: string;
     metadata?: Record<string, unknown>;
+    chunkSize: number;
 }
 
 const DEFAULT_CHUNK_SIZE = 800;
@@ -34,6 +37,7 @@ export async function indexDocuments(options: IndexDocumentsOptions): Promise<nu
         overlap = DEFAULT_OVERLAP,
         allowedExtensions,
         embeddingModel,
+        embeddingPrecision,
     } = options;
 
     if (chunkSize <= 0) {
@@ -54,7 +58,7 @@ export async function indexDocuments(options: IndexDocumentsOptions): Promise<nu
     const fileRecords = await readFiles(files);
     const chunks = chunkFiles(fileRecords, { chunkSize, overlap });
 
-    await persistChunks(chunks, chunkSize, embeddingModel);
+    await persistChunks(chunks, embeddingModel, embeddingPrecision);
     await notifyIndexerComplete(chunks.length);
     return chunks.length;
 }
@@ -128,17 +132,19 @@ function chunkFiles(files: FileRecord[], config: ChunkingConfig): ChunkRecord[]
 
     for (const file of files) {
         const chunkList = chunkContent(file.content, config);
-        chunkList.forEach((content, index) => {
+        const idPrefix = `${file.path}:`;
+        for (let index = 0; index < chunkList.length; index++) {
             chunks.push({
-                id: `${file.path}:${index}`,
+                id: idPrefix + index,
                 filePath: file.path,
-                content,
+                content: chunkList[index],
                 metadata: {
                     index: index,
                     totalChunks: chunkList.length,
                 },
+                chunkSize: config.chunkSize,
             });
-        });
+        }
     }
 
     return chunks;
@@ -270,7 +276,11 @@ function splitLongSegment(text: string, chunkSize: number, overlap: number): str
     return chunks.filter((chunk) => chunk.length > 0);
 }
 
-async function persistChunks(chunks: ChunkRecord[], chunkSize: number, embeddingModel?: string): Promise<void> {
+async function persistChunks(
+    chunks: ChunkRecord[],
+    embeddingModel?: string,
+    embeddingPrecision?: EmbeddingPrecision,
+): Promise<void> {
     if (!chunks.length) {
         return;
     }
@@ -281,23 +291,15 @@ async function persistChunks(chunks: ChunkRecord[], chunkSize: number, embedding
         renderProgress(0, total);
     }
 
-    await appendChunks(
-        chunks.map((chunk) => ({
-            id: chunk.id,
-            filePath: chunk.filePath,
-            content: chunk.content,
-            metadata: chunk.metadata,
-            chunkSize,
-        })),
-        {
-            embeddingModel,
-            onProgress: (current) => {
-                if (process.stdout.isTTY) {
-                    renderProgress(current, total);
-                }
-            },
+    await appendChunks(chunks, {
+        embeddingModel,
+        precision: embeddingPrecision,
+        onProgress: (current) => {
+            if (process.stdout.isTTY) {
+                renderProgress(current, total);
+            }
         },
-    );
+    });
 
     if (process.stdout.isTTY) {
         process.stdout.write("\n");
@@ -15,6 +15,7 @@ export interface QueryContext {
     webSearchProvider?: string;
     webSearchResults?: number;
     ragEnabled?: boolean;
+    binaryPrefilter?: boolean;
 }
 
 export async function runQuery(context: QueryContext): Promise<void> {
@@ -30,11 +31,15 @@ export async function runQuery(context: QueryContext): Promise<void> {
         webSearchResults,
     } = context as QueryContext & { webSearchProvider?: string; webSearchResults?: number };
 
-    const queryEmbedding = await getEmbedding(question, embeddingModel);
-    const contexts = context.ragEnabled === false ? [] : searchChunks(queryEmbedding, chunksPerQuery);
-    const webSnippets = webSearchEnabled
-        ? await safeWebSearch(question, webSearchProvider, webSearchResults ?? 3)
-        : [];
+    // Retrieval and web search are independent; run them concurrently.
+    const [contexts, webSnippets] = await Promise.all([
+        context.ragEnabled === false || !question.trim()
+            ? []
+            : searchChunks(getEmbedding(question, embeddingModel), chunksPerQuery, {
+                  binaryPrefilter: context.binaryPrefilter,
+              }),
+        webSearchEnabled ? safeWebSearch(question, webSearchProvider, webSearchResults ?? 3) : [],
+    ]);
     const prompt = buildPrompt(question, contexts, webSnippets, webSearchEnabled);
 
     try {
@@ -3,6 +3,7 @@ import os from "os";
 import path from "path";
 
 import { ProviderName, PROVIDERS } from "./models/provider";
+import { EmbeddingPrecision, isEmbeddingPrecision } from "./retrieval/quantize";
 
 export interface OpenBookConfig {
     chunkSize: number;
@@ -15,6 +16,8 @@ export interface OpenBookConfig {
     webSearchEnabled: boolean;
     chunksPerQuery: number;
     embeddingModel: string;
+    embeddingPrecision: EmbeddingPrecision;
+    binaryPrefilter: boolean;
     webSearchProvider: string;
     webSearchResults: number;
     ragEnabled: boolean;
@@ -36,6 +39,8 @@ const DEFAULT_CONFIG: OpenBookConfig = {
     webSearchEnabled: false,
     chunksPerQuery: 5,
     embeddingModel: "nomic-embed-text",
+    embeddingPrecision: "float32",
+    binaryPrefilter: false,
     webSearchProvider: "bing",
     webSearchResults: 3,
     ragEnabled: true,
@@ -82,6 +87,12 @@ export function loadConfig(): OpenBookConfig {
                 typeof data.embeddingModel === "string" && data.embeddingModel.length > 0
                     ? data.embeddingModel
                     : DEFAULT_CONFIG.embeddingModel,
+            embeddingPrecision:
+                typeof data.embeddingPrecision === "string" && isEmbeddingPrecision(data.embeddingPrecision)
+                    ? data.embeddingPrecision
+                    : DEFAULT_CONFIG.embeddingPrecision,
+            binaryPrefilter:
+                typeof data.binaryPrefilter === "boolean" ? data.binaryPrefilter : DEFAULT_CONFIG.binaryPrefilter,
             webSearchProvider:
                 typeof data.webSearchProvider === "string" && data.webSearchProvider.length > 0
                     ? data.webSearchProvider
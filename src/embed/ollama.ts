@@ -1,12 +1,93 @@
+import { createHash } from "crypto";
+
 const OLLAMA_URL = process.env.OLLAMA_URL ?? "http://127.0.0.1:11434";
 const DEFAULT_MODEL = process.env.OPENBOOK_EMBED_MODEL ?? "nomic-embed-text";
 
-export async function getEmbedding(text: string, modelOverride?: string): Promise<number[]> {
-    const model = modelOverride ?? DEFAULT_MODEL;
-    const response = await fetch(`${OLLAMA_URL}/api/embeddings`, {
+const CACHE_LIMIT = 2048;
+
+// Identical concurrent requests share one round-trip to Ollama.
+const inFlight = new Map<string, Promise<Float32Array>>();
+// LRU of finished embeddings; Map iteration order doubles as recency order.
+// Cached arrays are shared between callers and must not be mutated.
+const cache = new Map<string, Float32Array>();
+
+export async function getEmbedding(text: string, modelOverride?: string): Promise<Float32Array> {
+    const [embedding] = await getEmbeddings([text], modelOverride);
+    return embedding;
+}
+
+/**
+ * Embed several texts with a single Ollama request. Cached and in-flight texts
+ * are reused; only the remaining ones are sent to the model. Blank texts are
+ * never sent and map to a zero vector.
+ */
+export async function getEmbeddings(texts: string[], modelOverride?: string): Promise<Float32Array[]> {
+    const model = resolveModel(modelOverride);
+    const keys = texts.map((text) => (text.trim() ? cacheKey(model, text) : null));
+
+    const missing = new Map<string, string>();
+    keys.forEach((key, idx) => {
+        if (key !== null && !cache.has(key) && !inFlight.has(key)) {
+            missing.set(key, texts[idx]);
+        }
+    });
+    if (missing.size) {
+        const batch = requestEmbeddings(Array.from(missing.values()), model);
+        Array.from(missing.keys()).forEach((key, slot) => {
+            const request = batch
+                .then((embeddings) => {
+                    remember(key, embeddings[slot]);
+                    return embeddings[slot];
+                })
+                .finally(() => inFlight.delete(key));
+            inFlight.set(key, request);
+        });
+    }
+
+    const embeddings = await Promise.all(
+        keys.map((key) => (key === null ? null : lookup(key) ?? (inFlight.get(key) as Promise<Float32Array>))),
+    );
+    if (!embeddings.includes(null)) {
+        return embeddings as Float32Array[];
+    }
+    const zero = new Float32Array(embeddings.find((embedding) => embedding !== null)?.length ?? 0);
+    return embeddings.map((embedding) => embedding ?? zero);
+}
+
+function cacheKey(model: string, text: string): string {
+    return `${model}\u0000${createHash("sha1").update(text).digest("base64")}`;
+}
+
+function lookup(key: string): Float32Array | undefined {
+    const cached = cache.get(key);
+    if (cached) {
+        cache.delete(key);
+        cache.set(key, cached);
+    }
+    return cached;
+}
+
+function remember(key: string, embedding: Float32Array): void {
+    cache.set(key, embedding);
+    if (cache.size > CACHE_LIMIT) {
+        cache.delete(cache.keys().next().value as string);
+    }
+}
+
+/**
+ * Ollama treats `name` and `name:latest` as the same model; normalize so they
+ * share cache entries and stored chunk fingerprints.
+ */
+export function resolveModel(modelOverride?: string): string {
+    const model = (modelOverride || DEFAULT_MODEL).trim();
+    return model.includes(":") ? model : `${model}:latest`;
+}
+
+async function requestEmbeddings(texts: string[], model: string): Promise<Float32Array[]> {
+    const response = await fetch(`${OLLAMA_URL}/api/embed`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ model, prompt: text }),
+        body: JSON.stringify({ model, input: texts }),
     });
 
     if (!response.ok) {
@@ -14,8 +95,8 @@ export async function getEmbedding(text: string, modelOverride?: string): Promis
     }
 
     const data: any = await response.json();
-    if (!Array.isArray(data.embedding)) {
-        throw new Error("Embedding response missing 'embedding' array");
+    if (!Array.isArray(data.embeddings) || data.embeddings.length !== texts.length) {
+        throw new Error("Embedding response missing 'embeddings' array");
     }
-    return data.embedding as number[];
+    return (data.embeddings as number[][]).map((embedding) => Float32Array.from(embedding));
 }
@@ -13,9 +13,11 @@ import { runQuery } from "./commands/query";
 import { loadConfig, OpenBookConfig, getDefaultConfig, applyConfigUpdate } from "./config";
 import { isValidProvider, PROVIDERS, ProviderName } from "./models/provider";
 import { resetSession } from "./session/reset";
+import { EMBEDDING_PRECISIONS, isEmbeddingPrecision } from "./retrieval/quantize";
 
 const program = new Command();
 const DEFAULT_OVERLAP = 80;
+const EXIT_COMMANDS = new Set(["exit", "quit", "bye"]);
 let currentConfig: OpenBookConfig = loadConfig();
 if (!currentConfig.apiKeys) {
     currentConfig.apiKeys = {};
@@ -65,6 +67,7 @@ program
                 allowedExtensions:
                     currentConfig.extensions.length > 0 ? currentConfig.extensions : undefined,
                 embeddingModel: currentConfig.embeddingModel,
+                embeddingPrecision: currentConfig.embeddingPrecision,
             });
 
             console.log(
@@ -86,10 +89,11 @@ program
         try {
             for (;;) {
                 const question = await rl.question("You> ");
-                if (!question.trim()) {
+                const trimmed = question.trim();
+                if (!trimmed) {
                     continue;
                 }
-                if (["exit", "quit", "bye"].includes(question.trim().toLowerCase())) {
+                if (EXIT_COMMANDS.has(trimmed.toLowerCase())) {
                     break;
                 }
                 await executeQuery(question);
@@ -394,6 +398,48 @@ program
         console.log(`Embedding model set to ${name}. Re-run indexing to regenerate embeddings.`);
     });
 
+program
+    .command("embedding-precision")
+    .description("Get or set how embeddings are stored on disk (float32 or int8)")
+    .argument("[precision]", `One of: ${EMBEDDING_PRECISIONS.join(", ")}`)
+    .action((precision?: string) => {
+        if (!precision) {
+            console.log(`Current embedding precision: ${currentConfig.embeddingPrecision}`);
+            return;
+        }
+
+        const normalized = precision.toLowerCase();
+        if (!isEmbeddingPrecision(normalized)) {
+            throw new InvalidArgumentError(`Precision must be one of: ${EMBEDDING_PRECISIONS.join(", ")}.`);
+        }
+
+        updateConfig({ embeddingPrecision: normalized });
+        console.log(`Embedding precision set to ${normalized}. Applies to newly indexed chunks.`);
+    });
+
+program
+    .command("binary-prefilter")
+    .description("Get or set approximate retrieval (sign-bit prefilter) for large indexes")
+    .argument("[state]", "Use 'on' to enable or 'off' to disable")
+    .action((state?: string) => {
+        if (!state) {
+            console.log(`Binary prefilter is ${currentConfig.binaryPrefilter ? "enabled" : "disabled"}.`);
+            return;
+        }
+        const normalized = state.toLowerCase();
+        if (["on", "true", "yes", "1"].includes(normalized)) {
+            updateConfig({ binaryPrefilter: true });
+            console.log("Binary prefilter enabled. Indexes of 2048+ chunks use approximate search.");
+            return;
+        }
+        if (["off", "false", "no", "0"].includes(normalized)) {
+            updateConfig({ binaryPrefilter: false });
+            console.log("Binary prefilter disabled. Retrieval scans every chunk exactly.");
+            return;
+        }
+        throw new InvalidArgumentError("State must be 'on' or 'off'.");
+    });
+
 program
     .command("config")
     .description("Show the current OpenBook configuration")
@@ -477,6 +523,7 @@ async function executeQuery(question: string): Promise<void> {
             webSearchProvider: currentConfig.webSearchProvider,
             webSearchResults: currentConfig.webSearchResults,
             ragEnabled: currentConfig.ragEnabled,
+            binaryPrefilter: currentConfig.binaryPrefilter,
         });
     } finally {
         stopSpinner();
@@ -549,6 +596,8 @@ function printConfigSummary(config: OpenBookConfig): void {
     console.log("Retrieval & Embeddings");
     console.log(`  RAG: ${formatSwitch(config.ragEnabled)}`);
     console.log(`  Embedding model: ${config.embeddingModel || "<not set>"}`);
+    console.log(`  Embedding precision: ${config.embeddingPrecision}`);
+    console.log(`  Binary prefilter: ${formatSwitch(config.binaryPrefilter)}`);
     console.log("");
 
     console.log("Web Search");
@@ -0,0 +1,82 @@
+export type EmbeddingPrecision = "float32" | "int8";
+
+export const EMBEDDING_PRECISIONS: EmbeddingPrecision[] = ["float32", "int8"];
+
+const INT8_MAX = 127;
+
+export interface QuantizedEmbedding {
+    values: number[];
+    scale: number;
+}
+
+export function isEmbeddingPrecision(value: string): value is EmbeddingPrecision {
+    return (EMBEDDING_PRECISIONS as string[]).includes(value);
+}
+
+/**
+ * Symmetric per-vector int8 quantization: `value ≈ quantized * scale`.
+ */
+export function quantizeInt8(embedding: ArrayLike<number>): QuantizedEmbedding {
+    let maxAbs = 0;
+    for (let i = 0; i < embedding.length; i++) {
+        const abs = Math.abs(embedding[i]);
+        if (abs > maxAbs) {
+            maxAbs = abs;
+        }
+    }
+    const values = new Array<number>(embedding.length);
+    if (maxAbs === 0) {
+        values.fill(0);
+        return { values, scale: 0 };
+    }
+    const inverse = INT8_MAX / maxAbs;
+    for (let i = 0; i < embedding.length; i++) {
+        values[i] = Math.round(embedding[i] * inverse);
+    }
+    return { values, scale: maxAbs / INT8_MAX };
+}
+
+export function dequantizeInto(values: ArrayLike<number>, scale: number, target: Float32Array, offset: number): void {
+    for (let i = 0; i < values.length; i++) {
+        target[offset + i] = values[i] * scale;
+    }
+}
+
+/**
+ * Pack the sign of every component into bits: one `ceil(dim / 32)`-word code
+ * per row of a row-major matrix.
+ */
+export function packSignBits(matrix: Float32Array, rows: number, dim: number): Uint32Array {
+    const words = Math.ceil(dim / 32);
+    const codes = new Uint32Array(rows * words);
+    for (let row = 0; row < rows; row++) {
+        const base = row * dim;
+        const codeBase = row * words;
+        for (let i = 0; i < dim; i++) {
+            if (matrix[base + i] > 0) {
+                codes[codeBase + (i >>> 5)] |= 1 << (i & 31);
+            }
+        }
+    }
+    return codes;
+}
+
+export function hammingDistance(
+    a: Uint32Array,
+    aOffset: number,
+    b: Uint32Array,
+    bOffset: number,
+    words: number,
+): number {
+    let distance = 0;
+    for (let w = 0; w < words; w++) {
+        distance += popcount32(a[aOffset + w] ^ b[bOffset + w]);
+    }
+    return distance;
+}
+
+function popcount32(value: number): number {
+    let v = value - ((value >>> 1) & 0x55555555);
+    v = (v & 0x33333333) + ((v >>> 2) & 0x33333333);
+    return Math.imul((v + (v >>> 4)) & 0x0f0f0f0f, 0x01010101) >>> 24;
+}
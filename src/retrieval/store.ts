@@ -1,8 +1,10 @@
+import { createHash } from "crypto";
 import fs from "fs";
 import path from "path";
 import os from "os";
 
-import { getEmbedding } from "../embed/ollama";
+import { getEmbeddings, resolveModel } from "../embed/ollama";
+import { dequantizeInto, EmbeddingPrecision, hammingDistance, packSignBits, quantizeInt8 } from "./quantize";
 
 export interface StoredChunk {
     id: string;
@@ -11,58 +13,291 @@ export interface StoredChunk {
     metadata?: Record<string, unknown>;
     embedding: number[];
     chunkSize: number;
+    /** Storage precision of `embedding`; absent means float32. */
+    precision?: EmbeddingPrecision;
+    /** Dequantization scale for int8 embeddings. */
+    scale?: number;
+    /** Hash of the content and embedding settings, used to skip unchanged chunks on re-index. */
+    fingerprint?: string;
 }
 
 const STORE_DIR = path.join(os.homedir(), ".openbook");
 const STORE_FILE = path.join(STORE_DIR, "chunks.jsonl");
+const EMBED_BATCH_SIZE = 32;
+const WRITE_BATCH_SIZE = 1000;
+// When the approximate prefilter is enabled, stores with at least this many
+// chunks are shortlisted by Hamming distance over sign bits before the exact
+// dot-product rerank; smaller stores are always scanned exactly.
+const BINARY_PREFILTER_MIN_ROWS = 2048;
+const BINARY_OVERSAMPLE = 10;
+const EMBED_CONCURRENCY =
+    parsePositiveInt(process.env.OPENBOOK_EMBED_CONCURRENCY) ?? Math.max(1, Math.floor(os.cpus().length / 2));
 
+type PendingChunk = Omit<StoredChunk, "embedding" | "precision" | "scale" | "fingerprint">;
+
+interface LoadedStore {
+    mtimeMs: number;
+    size: number;
+    chunks: StoredChunk[];
+    /** Parsed lines in the file, including ones superseded by a later line with the same id. */
+    lineCount: number;
+    /** Packed, normalized embeddings for `dim`; rebuilt if the query dimension changes. */
+    matrix?: Float32Array;
+    dim?: number;
+    /** Sign-bit codes of `matrix`, built on first use by the binary prefilter. */
+    codes?: Uint32Array;
+}
+
+// Parsed store reused across queries (e.g. a chat session) until the file changes.
+let loadedStore: LoadedStore | null = null;
+// Set once STORE_DIR is known to exist so repeated appends skip the mkdir call.
+let storeDirReady = false;
+
+/**
+ * Embed and persist chunks. Chunks whose id is already stored with the same
+ * fingerprint (content + embedding settings) and the same record are skipped,
+ * so re-indexing an unchanged directory is a no-op. A changed content, model or
+ * precision re-embeds the chunk; a change to only `filePath`, `metadata` or
+ * `chunkSize` rewrites the line with the stored embedding and no Ollama call.
+ * Appended lines supersede the earlier line with the same id when the store
+ * is loaded. Superseded lines
+ * stay in chunks.jsonl until they outnumber the live ones, at which point the
+ * file is rewritten with only the latest version of each chunk.
+ */
 export async function appendChunks(
-    chunks: Omit<StoredChunk, "embedding">[],
-    options: { embeddingModel?: string; onProgress?: (current: number, total: number) => void },
+    chunks: PendingChunk[],
+    options: {
+        embeddingModel?: string;
+        precision?: EmbeddingPrecision;
+        concurrency?: number;
+        writeBatchSize?: number;
+        onProgress?: (current: number, total: number) => void;
+    },
 ): Promise<void> {
     if (!chunks.length) {
         return;
     }
-    await fs.promises.mkdir(STORE_DIR, { recursive: true });
-    const lines: string[] = [];
-    for (let i = 0; i < chunks.length; i++) {
-        const chunk = chunks[i];
-        const embedding = await getEmbedding(chunk.content, options.embeddingModel);
-        lines.push(JSON.stringify({ ...chunk, embedding }));
-        options.onProgress?.(i + 1, chunks.length);
+
+    const existing = await loadStore();
+    if (existing && existing.lineCount - existing.chunks.length >= Math.max(existing.chunks.length, 1)) {
+        await compactStore(existing);
+    }
+    const stored = new Map<string, StoredChunk>();
+    existing?.chunks.forEach((chunk) => stored.set(chunk.id, chunk));
+    const model = resolveModel(options.embeddingModel);
+    const pending: PendingChunk[] = [];
+    const fingerprints: string[] = [];
+    const refreshed: string[] = [];
+    for (const chunk of chunks) {
+        const fingerprint = fingerprintChunk(chunk.content, model, options.precision);
+        const previous = stored.get(chunk.id);
+        if (!previous || previous.fingerprint !== fingerprint) {
+            pending.push(chunk);
+            fingerprints.push(fingerprint);
+        } else if (!sameRecord(chunk, previous)) {
+            const { embedding, precision, scale } = previous;
+            refreshed.push(JSON.stringify({ ...chunk, embedding, precision, scale, fingerprint }));
+        }
+    }
+    const skipped = chunks.length - pending.length;
+    if (skipped > 0) {
+        options.onProgress?.(skipped, chunks.length);
+    }
+    if (!pending.length && !refreshed.length) {
+        return;
     }
-    await fs.promises.appendFile(STORE_FILE, lines.join("\n") + "\n", "utf8");
+
+    if (!storeDirReady) {
+        await fs.promises.mkdir(STORE_DIR, { recursive: true });
+        storeDirReady = true;
+    }
+    if (refreshed.length) {
+        await fs.promises.appendFile(STORE_FILE, refreshed.join("\n") + "\n", "utf8");
+    }
+    if (!pending.length) {
+        return;
+    }
+
+    // Keep several batches in flight so Ollama can overlap them; results are
+    // slotted by batch index and flushed in input order once enough contiguous
+    // lines are ready, so memory stays bounded and appends stay large.
+    const batchCount = Math.ceil(pending.length / EMBED_BATCH_SIZE);
+    const writeBatchSize = options.writeBatchSize ?? WRITE_BATCH_SIZE;
+    const serialized = new Array<string | undefined>(batchCount);
+    let nextBatch = 0;
+    let nextWrite = 0;
+    let embedded = 0;
+    let buffered: string[] = [];
+    let bufferedChunks = 0;
+    let writes: Promise<void> = Promise.resolve();
+    const flush = (): Promise<void> => {
+        const payload = buffered.join("\n") + "\n";
+        buffered = [];
+        bufferedChunks = 0;
+        writes = writes.then(() => fs.promises.appendFile(STORE_FILE, payload, "utf8"));
+        return writes;
+    };
+    // Once any batch fails the whole append is abandoned, so stop handing out
+    // new batches and drop results from batches that were already in flight.
+    let failed = false;
+    const worker = async (): Promise<void> => {
+        try {
+            while (!failed && nextBatch < batchCount) {
+                const index = nextBatch++;
+                const start = index * EMBED_BATCH_SIZE;
+                const batch = pending.slice(start, start + EMBED_BATCH_SIZE);
+                const embeddings = await getEmbeddings(
+                    batch.map((chunk) => chunk.content),
+                    options.embeddingModel,
+                );
+                if (failed) {
+                    return;
+                }
+                serialized[index] = batch
+                    .map((chunk, offset) =>
+                        JSON.stringify(
+                            serializeChunk(chunk, embeddings[offset], fingerprints[start + offset], options.precision),
+                        ),
+                    )
+                    .join("\n");
+                embedded += batch.length;
+                options.onProgress?.(skipped + embedded, chunks.length);
+
+                while (nextWrite < batchCount && serialized[nextWrite] !== undefined) {
+                    buffered.push(serialized[nextWrite] as string);
+                    bufferedChunks += Math.min(EMBED_BATCH_SIZE, pending.length - nextWrite * EMBED_BATCH_SIZE);
+                    serialized[nextWrite] = undefined;
+                    nextWrite++;
+                }
+                if (bufferedChunks >= writeBatchSize) {
+                    await flush();
+                }
+            }
+        } catch (error) {
+            failed = true;
+            throw error;
+        }
+    };
+    const workers = Math.min(options.concurrency ?? EMBED_CONCURRENCY, batchCount);
+    await Promise.all(Array.from({ length: workers }, worker));
+
+    if (buffered.length) {
+        await flush();
+    }
+    await writes;
 }
 
-export function searchChunks(queryEmbedding: number[], k: number): StoredChunk[] {
-    if (!fs.existsSync(STORE_FILE)) {
-        return [];
+/**
+ * Rank stored chunks against a query embedding. The embedding may still be
+ * pending; the store is read from disk while it resolves. `binaryPrefilter`
+ * opts into approximate search on large stores, trading some recall for a
+ * shorter exact scan.
+ */
+export async function searchChunks(
+    queryEmbedding: ArrayLike<number> | Promise<ArrayLike<number>>,
+    k: number,
+    options: { binaryPrefilter?: boolean } = {},
+): Promise<StoredChunk[]> {
+    const [store, embedding] = await Promise.all([loadStore(), queryEmbedding]);
+    return store ? rankChunks(store, embedding, k, options.binaryPrefilter ?? false) : [];
+}
+
+async function loadStore(): Promise<LoadedStore | null> {
+    let stats: fs.Stats;
+    try {
+        stats = await fs.promises.stat(STORE_FILE);
+    } catch (error) {
+        if ((error as NodeJS.ErrnoException).code === "ENOENT") {
+            loadedStore = null;
+            return null;
+        }
+        throw error;
     }
-    const raw = fs.readFileSync(STORE_FILE, "utf8").trim();
-    if (!raw) {
-        return [];
+    if (loadedStore && loadedStore.mtimeMs === stats.mtimeMs && loadedStore.size === stats.size) {
+        return loadedStore;
     }
+    const raw = await fs.promises.readFile(STORE_FILE, "utf8");
+    // Later lines win, so re-indexed chunks replace their earlier versions.
     const chunks: StoredChunk[] = [];
-    for (const line of raw.split(/\n+/)) {
+    const positions = new Map<string, number>();
+    let lineCount = 0;
+    for (const line of raw.split("\n")) {
+        if (!line) {
+            continue;
+        }
         try {
             const parsed = JSON.parse(line);
             if (parsed && Array.isArray(parsed.embedding)) {
-                chunks.push(parsed);
+                lineCount++;
+                const position = positions.get(parsed.id);
+                if (position === undefined) {
+                    positions.set(parsed.id, chunks.length);
+                    chunks.push(parsed);
+                } else {
+                    chunks[position] = parsed;
+                }
             }
         } catch {
             continue;
         }
     }
-    const ranked = chunks
-        .map((chunk) => ({ chunk, score: cosineSimilarity(queryEmbedding, chunk.embedding) }))
-        .filter((entry) => Number.isFinite(entry.score))
-        .sort((a, b) => b.score - a.score)
-        .slice(0, k)
-        .map((entry) => entry.chunk);
+    loadedStore = { mtimeMs: stats.mtimeMs, size: stats.size, chunks, lineCount };
+    return loadedStore;
+}
+
+function rankChunks(
+    store: LoadedStore,
+    queryEmbedding: ArrayLike<number>,
+    k: number,
+    binaryPrefilter: boolean,
+): StoredChunk[] {
+    if (k <= 0) {
+        return [];
+    }
+    const { chunks } = store;
+    const dim = queryEmbedding.length;
+    if (dim === 0) {
+        // Blank queries embed to an empty vector; leave the packed matrix alone.
+        return chunks.slice(0, k);
+    }
+    const query = Float32Array.from(queryEmbedding);
+    normalizeRow(query, 0, dim);
+    if (!store.matrix || store.dim !== dim) {
+        store.matrix = packEmbeddings(chunks, dim);
+        store.dim = dim;
+        store.codes = undefined;
+    }
+    const matrix = store.matrix;
+    const candidates =
+        binaryPrefilter && chunks.length >= BINARY_PREFILTER_MIN_ROWS
+            ? hammingCandidates(store, query, k * BINARY_OVERSAMPLE)
+            : null;
+    const count = candidates ? candidates.length : chunks.length;
+    const top: number[] = [];
+    const topScores: number[] = [];
+    for (let i = 0; i < count; i++) {
+        const row = candidates ? candidates[i] : i;
+        const score = dotProduct(query, matrix, row * dim);
+        if (!Number.isFinite(score) || (top.length === k && score <= topScores[k - 1])) {
+            continue;
+        }
+        // Insert into the descending top-k list; ties keep the earlier row first.
+        let position = top.length < k ? top.length : k - 1;
+        while (position > 0 && topScores[position - 1] < score) {
+            top[position] = top[position - 1];
+            topScores[position] = topScores[position - 1];
+            position--;
+        }
+        top[position] = row;
+        topScores[position] = score;
+    }
+    const ranked = top.map((row) => chunks[row]);
     return ranked.length ? ranked : chunks.slice(0, k);
 }
 
 export function clearStore(): void {
+    loadedStore = null;
+    storeDirReady = false;
     if (fs.existsSync(STORE_FILE)) {
         fs.unlinkSync(STORE_FILE);
     }
@@ -71,20 +306,136 @@ export function clearStore(): void {
     }
 }
 
-function cosineSimilarity(a: number[], b: number[]): number {
-    if (!a.length || a.length !== b.length) {
-        return 0;
+/**
+ * Rewrite chunks.jsonl with only the live version of each chunk. The new file
+ * is written beside the old one and renamed over it so a crash never leaves a
+ * truncated store.
+ */
+async function compactStore(store: LoadedStore): Promise<void> {
+    const tempFile = `${STORE_FILE}.tmp`;
+    const lines = store.chunks.map((chunk) => JSON.stringify(chunk));
+    await fs.promises.writeFile(tempFile, lines.length ? lines.join("\n") + "\n" : "", "utf8");
+    await fs.promises.rename(tempFile, STORE_FILE);
+    store.lineCount = store.chunks.length;
+    loadedStore = null;
+}
+
+/** Whether everything but the embedding fields matches; `content` is covered by the fingerprint. */
+function sameRecord(chunk: PendingChunk, stored: StoredChunk): boolean {
+    return (
+        chunk.filePath === stored.filePath &&
+        chunk.chunkSize === stored.chunkSize &&
+        JSON.stringify(chunk.metadata) === JSON.stringify(stored.metadata)
+    );
+}
+
+function fingerprintChunk(content: string, embeddingModel: string, precision: EmbeddingPrecision = "float32"): string {
+    return createHash("sha1").update(`${embeddingModel}\u0000${precision}\u0000${content}`).digest("base64");
+}
+
+function serializeChunk(
+    chunk: PendingChunk,
+    embedding: Float32Array,
+    fingerprint: string,
+    precision: EmbeddingPrecision = "float32",
+): StoredChunk {
+    if (precision === "int8") {
+        const { values, scale } = quantizeInt8(embedding);
+        return { ...chunk, embedding: values, precision, scale, fingerprint };
     }
-    let dot = 0;
-    let magA = 0;
-    let magB = 0;
-    for (let i = 0; i < a.length; i++) {
-        dot += a[i] * b[i];
-        magA += a[i] * a[i];
-        magB += b[i] * b[i];
+    return { ...chunk, embedding: Array.from(embedding, toFloat32Digits), fingerprint };
+}
+
+/**
+ * Nine significant digits round-trip any float32 exactly; JSON.stringify would
+ * otherwise print the full 17-digit double expansion of each component.
+ */
+function toFloat32Digits(value: number): number {
+    return Number(value.toPrecision(9));
+}
+
+/**
+ * Shortlist the `limit` rows whose sign bits are closest to the query's,
+ * using a histogram over distances instead of a full sort.
+ */
+function hammingCandidates(store: LoadedStore, query: Float32Array, limit: number): number[] {
+    const rows = store.chunks.length;
+    const dim = query.length;
+    const words = Math.ceil(dim / 32);
+    if (!store.codes) {
+        store.codes = packSignBits(store.matrix as Float32Array, rows, dim);
+    }
+    const codes = store.codes;
+    const queryCode = packSignBits(query, 1, dim);
+
+    const distances = new Uint32Array(rows);
+    const histogram = new Uint32Array(dim + 1);
+    for (let row = 0; row < rows; row++) {
+        distances[row] = hammingDistance(codes, row * words, queryCode, 0, words);
+        histogram[distances[row]]++;
+    }
+    let threshold = 0;
+    let below = 0;
+    while (threshold < dim && below + histogram[threshold] < limit) {
+        below += histogram[threshold];
+        threshold++;
+    }
+
+    let tieSlots = limit - below;
+    const candidates: number[] = [];
+    for (let row = 0; row < rows; row++) {
+        if (distances[row] < threshold) {
+            candidates.push(row);
+        } else if (distances[row] === threshold && tieSlots > 0) {
+            candidates.push(row);
+            tieSlots--;
+        }
+    }
+    return candidates;
+}
+
+function packEmbeddings(chunks: StoredChunk[], dim: number): Float32Array {
+    // Rows are L2-normalized so cosine similarity reduces to a dot product.
+    // Rows whose dimension does not match the query stay zeroed and score 0.
+    const matrix = new Float32Array(chunks.length * dim);
+    for (let row = 0; row < chunks.length; row++) {
+        const { embedding, precision, scale } = chunks[row];
+        if (embedding.length !== dim) {
+            continue;
+        }
+        if (precision === "int8") {
+            dequantizeInto(embedding, scale ?? 0, matrix, row * dim);
+        } else {
+            matrix.set(embedding, row * dim);
+        }
+        normalizeRow(matrix, row * dim, dim);
+    }
+    return matrix;
+}
+
+function normalizeRow(values: Float32Array, offset: number, dim: number): void {
+    let magnitude = 0;
+    for (let i = offset; i < offset + dim; i++) {
+        magnitude += values[i] * values[i];
+    }
+    if (magnitude === 0) {
+        return;
     }
-    if (magA === 0 || magB === 0) {
-        return 0;
+    const inverse = 1 / Math.sqrt(magnitude);
+    for (let i = offset; i < offset + dim; i++) {
+        values[i] *= inverse;
     }
-    return dot / (Math.sqrt(magA) * Math.sqrt(magB));
+}
+
+function dotProduct(query: Float32Array, matrix: Float32Array, offset: number): number {
+    let dot = 0;
+    for (let i = 0; i < query.length; i++) {
+        dot += query[i] * matrix[offset + i];
+    }
+    return dot;
+}
+
+function parsePositiveInt(value: string | undefined): number | undefined {
+    const parsed = Number.parseInt(value ?? "", 10);
+    return Number.isFinite(parsed) && parsed > 0 ? parsed : undefined;
 }
@@ -3,8 +3,9 @@
 from __future__ import annotations
 
 import os
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 os.environ.setdefault("KMP_DUPLICATE_LIB_OK", "TRUE")
 os.environ.setdefault("OMP_NUM_THREADS", "1")
@@ -21,7 +22,7 @@ from langchain.chains import RetrievalQA
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
 from langchain_ollama import OllamaLLM
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 
 from rag_bootstrap import initialize_vector_store
 from vector_db import ChromaVectorStore
@@ -35,39 +36,44 @@ class ChromaVectorStoreRetriever(BaseRetriever):
 
     model_config = {"arbitrary_types_allowed": True}
 
+    # Resolved once from search_kwargs so each query skips the dict lookup and cast.
+    _k: int = PrivateAttr(default=4)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._k = int(self.search_kwargs.get("k", 4))
+
     def _get_relevant_documents(self, query: str) -> List[Document]:
-        result = self.vector_store.similarity_search(
-            query,
-            k=int(self.search_kwargs.get("k", 4)),
-        )
-        return _chroma_result_to_documents(result)
+        result = self.vector_store.similarity_search(query, k=self._k)
+        return list(islice(_chroma_result_to_documents(result), self._k))
 
     async def _aget_relevant_documents(self, query: str) -> List[Document]:
         return self._get_relevant_documents(query)
 
 
-def _chroma_result_to_documents(result: Dict[str, Any]) -> List[Document]:
+def _chroma_result_to_documents(result: Dict[str, Any]) -> Iterator[Document]:
     documents = result.get("documents", []) or []
     metadatas = result.get("metadatas", []) or []
     ids = result.get("ids", []) or []
 
     if not documents:
-        return []
+        return
 
     flat_docs = documents[0] if isinstance(documents[0], list) else documents
     flat_meta = metadatas[0] if metadatas and isinstance(metadatas[0], list) else metadatas
     flat_ids = ids[0] if ids and isinstance(ids[0], list) else ids
 
-    docs: List[Document] = []
+    # The query result is discarded after conversion, so its metadata dicts are
+    # reused in place and Documents are built lazily without re-validation.
     for idx, text in enumerate(flat_docs):
+        doc_id = flat_ids[idx] if flat_ids else str(idx)
         metadata: Dict[str, Any]
         if flat_meta:
-            metadata = dict(flat_meta[idx])
+            metadata = flat_meta[idx]
+            metadata.setdefault("doc_id", doc_id)
         else:
-            metadata = {}
-        metadata.setdefault("doc_id", flat_ids[idx] if flat_ids else str(idx))
-        docs.append(Document(page_content=text, metadata=metadata))
-    return docs
+            metadata = {"doc_id": doc_id}
+        yield Document.model_construct(page_content=text, metadata=metadata)
 
 
 def build_sample_vector_store(collection_name: str = "ollama_rag_session") -> ChromaVectorStore: